@@ -1,8 +1,21 @@
 import streamlit as st
 import pandas as pd
+import numpy as np
 import altair as alt
 from datetime import datetime
 import io
+import os
+import re
+import uuid
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from operator import itemgetter
+
+try:
+    from numba import njit  # optional: speeds up the balance line on large histories
+except ImportError:
+    njit = None
 
 st.set_page_config(page_title="Budget Tracker Pro", page_icon="💰", layout="wide")
 
@@ -10,8 +23,13 @@ st.set_page_config(page_title="Budget Tracker Pro", page_icon="💰", layout="wi
 # Config
 # ----------------------------
 REQUIRED_COLS = ["Date", "Type", "Category", "Description", "Amount"]
+TYPE_OPTIONS = ["Income", "Expense"]
 CATEGORY_OPTIONS = ["Food", "Transport", "Bills", "Entertainment", "Other"]
 CURRENCY_OPTIONS = {"$": "USD", "₦": "NGN", "€": "EUR", "£": "GBP"}
+STORE_DIR = "budget_data"  # one sub-directory of Parquet segments per store id
+STORE_MAX_SEGMENTS = 64  # appends beyond this many segments compact the store instead
+CACHE_MAX_ENTRIES = 16  # bounds each st.cache_data helper; keys change on every mutation
+NUMBA_MIN_ROWS = 50_000  # below this the one-time JIT compile costs more than it saves
 
 # ----------------------------
 # Ensure schema
@@ -28,15 +46,198 @@ def ensure_schema(df: pd.DataFrame) -> pd.DataFrame:
             else:
                 df[col] = pd.Series(dtype="object")
     df = df[REQUIRED_COLS]
-    df["Date"] = pd.to_datetime(df["Date"], errors="coerce")
-    df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce")
+    df["Date"] = pd.to_datetime(df["Date"], errors="coerce").astype("datetime64[s]")
+    df["Amount"] = pd.to_numeric(df["Amount"], errors="coerce").astype("float64")
+    # Values outside the allowed lists become null rather than raising
+    df["Type"] = df["Type"].where(df["Type"].isin(TYPE_OPTIONS)).astype(pd.CategoricalDtype(TYPE_OPTIONS))
+    df["Category"] = df["Category"].where(df["Category"].isin(CATEGORY_OPTIONS)).astype(pd.CategoricalDtype(CATEGORY_OPTIONS))
+    df["Month"] = df["Date"].dt.to_period("M")  # derived, not user-facing
+    return df
+
+# ----------------------------
+# Running balance
+# ----------------------------
+def _balance_loop(amount: np.ndarray, is_income: np.ndarray) -> np.ndarray:
+    out = np.empty(amount.size, dtype=np.float64)
+    acc = 0.0
+    for i in range(amount.size):
+        acc += amount[i] if is_income[i] else -amount[i]
+        out[i] = acc
+    return out
+
+@st.cache_resource
+def _balance_kernel():
+    # Build the dispatcher once per process, not on every rerun of this script
+    return njit(cache=True, fastmath=True)(_balance_loop) if njit else None
+
+def running_balance(amount: np.ndarray, is_income: np.ndarray) -> np.ndarray:
+    kernel = _balance_kernel() if amount.size >= NUMBA_MIN_ROWS else None
+    if kernel is not None:
+        return kernel(amount, is_income)
+    return np.cumsum(np.where(is_income, amount, -amount), dtype=np.float64)
+
+# ----------------------------
+# Persistence
+# ----------------------------
+# A store is a directory of "<seq>-base.parquet" / "<seq>-part.parquet" segments.
+# Appends add a small part; rewrites add a new base, and only the newest base
+# plus the parts after it are live. Each segment is written to a temp file and
+# renamed into place, so a crash mid-write never damages the live data.
+def _store_segments(path: str) -> list:
+    if not os.path.isdir(path):
+        return []
+    names = sorted(n for n in os.listdir(path) if n.endswith(".parquet"))
+    bases = [i for i, n in enumerate(names) if n.endswith("-base.parquet")]
+    return names[bases[-1]:] if bases else names
+
+def _write_segment(path: str, df: pd.DataFrame, kind: str) -> str:
+    os.makedirs(path, exist_ok=True)
+    seq = max((int(n.split("-", 1)[0]) for n in os.listdir(path) if n.endswith(".parquet")), default=0) + 1
+    name = f"{seq:012d}-{kind}.parquet"
+    tmp = os.path.join(path, name + ".tmp")
+    pq.write_table(pa.Table.from_pandas(df[REQUIRED_COLS], preserve_index=False), tmp)
+    os.replace(tmp, os.path.join(path, name))
+    return name
+
+@st.cache_resource
+def load_store(path: str) -> pd.DataFrame:
+    frames = [pq.read_table(os.path.join(path, n), columns=REQUIRED_COLS).to_pandas() for n in _store_segments(path)]
+    df = ensure_schema(pd.concat(frames, ignore_index=True) if frames else None)
+    if not df["Date"].is_monotonic_increasing:
+        df = df.sort_values("Date", kind="mergesort", ignore_index=True)
+    return df
+
+def save_store(path: str, df: pd.DataFrame):
+    base = _write_segment(path, df, "base")
+    for name in os.listdir(path):
+        if name < base:  # superseded segments and leftover temp files
+            os.remove(os.path.join(path, name))
+    load_store.clear()
+
+def append_store(path: str, df: pd.DataFrame):
+    _write_segment(path, df, "part")
+    load_store.clear()
+
+def read_transactions_csv(file) -> tuple[pd.DataFrame, int]:
+    """Parse an uploaded CSV; returns the valid rows in date order and how many rows were skipped."""
+    # Arrow's threaded, typed parser avoids pd.read_csv's object-dtype inference
+    table = pa_csv.read_csv(file, convert_options=pa_csv.ConvertOptions(
+        column_types={
+            "Date": pa.timestamp("s"),
+            "Type": pa.string(),
+            "Category": pa.string(),
+            "Description": pa.string(),
+            "Amount": pa.float64(),
+        },
+        include_columns=REQUIRED_COLS,
+    ))
+    df = table.to_pandas()
+    # Accept "income" / " FOOD " etc.; categories we don't track fall back to "Other"
+    df["Type"] = df["Type"].str.strip().str.capitalize()
+    category = df["Category"].str.strip().str.capitalize()
+    df["Category"] = category.where(category.isin(CATEGORY_OPTIONS), "Other")
+    df = ensure_schema(df)
+    # Same rule as the Add form: amounts must be positive, the sign comes from Type
+    valid = df.dropna(subset=["Date", "Type", "Amount"])
+    valid = valid[valid["Amount"] > 0]
+    return valid.sort_values("Date", kind="mergesort"), len(df) - len(valid)
+
+# ----------------------------
+# Transactions store
+# ----------------------------
+# Rows live in a plain list of dicts; the DataFrame is only built when a view
+# needs it and is kept in session state until the next mutation bumps the version.
+def tx_key() -> tuple:
+    return (st.session_state["session_id"], st.session_state["tx_version"], len(st.session_state["transactions_rows"]))
+
+def store_path() -> str:
+    return os.path.join(STORE_DIR, st.session_state["store_id"])
+
+def apply_recurring(rows: list, rec_list: list, when: datetime) -> list:
+    # One batched extend, however many recurring items there are
+    new_rows = [{**r, "Date": when} for r in rec_list]
+    rows.extend(new_rows)
+    return new_rows
+
+def touch_transactions(new_rows: list | None = None):
+    # Appends persist only the new rows; edits, deletes and resets rewrite the store
+    st.session_state["tx_version"] += 1
+    path = store_path()
+    if new_rows is not None and len(_store_segments(path)) < STORE_MAX_SEGMENTS:
+        append_store(path, build_df(new_rows))
+    else:
+        save_store(path, transactions_df())
+
+def build_df(rows: list) -> pd.DataFrame:
+    return ensure_schema(pd.DataFrame.from_records(rows, columns=REQUIRED_COLS))
+
+def transactions_df() -> pd.DataFrame:
+    # Validate once per version; later calls in the same rerun reuse the frame
+    key = tx_key()
+    if st.session_state.get("_schema_ok_key") != key:
+        st.session_state["_tx_df"] = build_df(st.session_state["transactions_rows"])
+        st.session_state["_schema_ok_key"] = key
+    return st.session_state["_tx_df"]
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def apply_filters(key: tuple, _df: pd.DataFrame, search_text: str, categories: tuple, month: pd.Period | None) -> pd.DataFrame:
+    df = _df
+    if search_text:
+        # Match the search text literally, compiling the pattern once per query
+        pattern = re.compile(re.escape(search_text), re.IGNORECASE)
+        descriptions = df["Description"].fillna("").astype(str).to_numpy()
+        mask = np.fromiter((pattern.search(d) is not None for d in descriptions), dtype=bool, count=len(descriptions))
+        df = df[mask]
+    if categories:
+        df = df[df["Category"].isin(categories)]
+    if month is not None:
+        df = df[df["Month"] == month]
     return df
 
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def monthly_totals(key: tuple, _df: pd.DataFrame) -> pd.DataFrame:
+    totals = _df.groupby(["Month", "Type"], observed=True, sort=False)["Amount"].sum().unstack("Type", fill_value=0.0)
+    return totals.reindex(columns=TYPE_OPTIONS, fill_value=0.0)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def row_labels(key: tuple, currency: str, _df: pd.DataFrame) -> np.ndarray:
+    # Built once per (version, currency); filter changes only index into it
+    dates = _df["Date"].dt.strftime("%Y-%m-%d").fillna("").tolist()
+    types = _df["Type"].astype(object).fillna("").tolist()
+    categories = _df["Category"].astype(object).fillna("").tolist()
+    return np.array(
+        [f"{d} | {t} | {c} | {currency}{a:.2f}" for d, t, c, a in zip(dates, types, categories, _df["Amount"].tolist())],
+        dtype=object,
+    )
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def export_csv(key: tuple, _df: pd.DataFrame) -> str:
+    return _df[REQUIRED_COLS].to_csv(index=False)
+
+@st.cache_data(max_entries=CACHE_MAX_ENTRIES)
+def month_labels(key: tuple, _df: pd.DataFrame) -> dict:
+    # Format only the unique months, not every row
+    return {m.strftime("%B %Y"): m for m in sorted(_df["Month"].dropna().unique())}
+
 # ----------------------------
 # State Init
 # ----------------------------
-if "transactions" not in st.session_state:
-    st.session_state["transactions"] = pd.DataFrame(columns=REQUIRED_COLS)
+if "session_id" not in st.session_state:
+    st.session_state["session_id"] = uuid.uuid4().hex
+
+if "tx_version" not in st.session_state:
+    st.session_state["tx_version"] = 0
+
+if "store_id" not in st.session_state:
+    # The store id lives in the URL, so each bookmarked link keeps its own data
+    store_id = st.query_params.get("store", "")
+    if not re.fullmatch(r"[0-9a-f]{32}", store_id):
+        store_id = uuid.uuid4().hex
+        st.query_params["store"] = store_id
+    st.session_state["store_id"] = store_id
+
+if "transactions_rows" not in st.session_state:
+    st.session_state["transactions_rows"] = load_store(store_path())[REQUIRED_COLS].to_dict("records")  # list of dicts
 
 if "budgets" not in st.session_state:
     st.session_state["budgets"] = {cat: None for cat in CATEGORY_OPTIONS}
@@ -50,8 +251,6 @@ if "recurring" not in st.session_state:
 if "editing" not in st.session_state:
     st.session_state["editing"] = None  # index being edited
 
-st.session_state["transactions"] = ensure_schema(st.session_state["transactions"])
-
 currency = st.session_state["currency"]
 
 # ----------------------------
@@ -76,22 +275,25 @@ if theme == "Dark":
     )
 
 if st.sidebar.button("🔄 Reset Data"):
-    for k in ["transactions", "budgets", "recurring", "editing"]:
+    for k in ["budgets", "recurring", "editing"]:
         st.session_state.pop(k, None)
+    st.session_state["transactions_rows"] = []
+    touch_transactions()
     st.rerun()
 
 st.sidebar.header("🔍 Filters")
-df_base = st.session_state["transactions"]
+df_base = transactions_df()
 
 if not df_base.empty:
     search_text = st.sidebar.text_input("Search by Description", value="")
     category_choices = sorted([c for c in df_base["Category"].dropna().unique().tolist() if str(c).strip() != ""])
     filter_category = st.sidebar.multiselect("Filter by Category", options=category_choices)
-    month_options = ["All"] + sorted(df_base["Date"].dropna().dt.strftime("%B %Y").unique().tolist())
-    filter_month = st.sidebar.selectbox("Filter by Month", options=month_options, index=0)
+    month_map = month_labels(tx_key(), df_base)
+    filter_month = st.sidebar.selectbox("Filter by Month", options=["All"] + list(month_map), index=0)
 else:
     search_text = ""
     filter_category = []
+    month_map = {}
     filter_month = "All"
 
 # ----------------------------
@@ -107,7 +309,7 @@ st.header("➕ Add Transaction")
 with st.form("transaction_form"):
     col1, col2, col3 = st.columns(3)
     with col1:
-        t_type = st.radio("Type", ["Income", "Expense"], horizontal=True)
+        t_type = st.radio("Type", TYPE_OPTIONS, horizontal=True)
     with col2:
         t_cat = st.selectbox("Category", CATEGORY_OPTIONS)
     with col3:
@@ -117,8 +319,9 @@ with st.form("transaction_form"):
     submit = st.form_submit_button("Add")
 
     if submit and t_amt > 0:
-        new_row = pd.DataFrame([[datetime.now(), t_type, t_cat, desc, t_amt]], columns=REQUIRED_COLS)
-        st.session_state["transactions"] = pd.concat([st.session_state["transactions"], new_row], ignore_index=True)
+        new_row = {"Date": datetime.now(), "Type": t_type, "Category": t_cat, "Description": desc, "Amount": t_amt}
+        st.session_state["transactions_rows"].append(new_row)
+        touch_transactions([new_row])
         st.success("✅ Transaction Added!")
 
 # ----------------------------
@@ -128,7 +331,7 @@ st.header("🔁 Recurring Transactions")
 with st.form("recurring_form"):
     col1, col2, col3 = st.columns(3)
     with col1:
-        r_type = st.radio("Type", ["Income", "Expense"], key="rec_type", horizontal=True)
+        r_type = st.radio("Type", TYPE_OPTIONS, key="rec_type", horizontal=True)
     with col2:
         r_cat = st.selectbox("Category", CATEGORY_OPTIONS, key="rec_cat")
     with col3:
@@ -140,51 +343,59 @@ with st.form("recurring_form"):
         st.session_state["recurring"].append({"Type": r_type, "Category": r_cat, "Amount": r_amt, "Description": r_desc})
         st.success("✅ Recurring Transaction Added!")
 
+if st.session_state["recurring"]:
+    if st.button("▶️ Apply Recurring"):
+        new_rows = apply_recurring(st.session_state["transactions_rows"], st.session_state["recurring"], datetime.now())
+        touch_transactions(new_rows)
+        st.success(f"✅ Applied {len(st.session_state['recurring'])} recurring transaction(s)!")
+
 # ----------------------------
 # Apply Filters
 # ----------------------------
-df = st.session_state["transactions"].copy()
-if search_text:
-    df = df[df["Description"].str.contains(search_text, case=False, na=False)]
-if filter_category:
-    df = df[df["Category"].isin(filter_category)]
-if filter_month != "All":
-    df = df[df["Date"].dt.strftime("%B %Y") == filter_month]
+df = transactions_df()
+filter_period = month_map.get(filter_month)
+if search_text or filter_category or filter_period is not None:
+    df = apply_filters(tx_key(), df, search_text, tuple(filter_category), filter_period)
 
 # ----------------------------
 # Display Data with Edit/Delete
 # ----------------------------
 st.header("📊 Transaction History")
 if not df.empty:
-    for i, row in df.iterrows():
-        with st.expander(f"{row['Date'].strftime('%Y-%m-%d')} | {row['Type']} | {row['Category']} | {currency}{row['Amount']:.2f}"):
-            st.write(f"**Description:** {row['Description']}")
-            if st.session_state["editing"] == i:
-                with st.form(f"edit_form_{i}"):
-                    new_type = st.radio("Type", ["Income", "Expense"], index=0 if row["Type"] == "Income" else 1)
-                    new_cat = st.selectbox("Category", CATEGORY_OPTIONS, index=CATEGORY_OPTIONS.index(row["Category"]))
-                    new_amt = st.number_input("Amount", min_value=0.0, value=float(row["Amount"]), format="%.2f")
-                    new_desc = st.text_input("Description", value=row["Description"])
-                    save = st.form_submit_button("Save")
-                    if save:
-                        st.session_state["transactions"].at[i, "Type"] = new_type
-                        st.session_state["transactions"].at[i, "Category"] = new_cat
-                        st.session_state["transactions"].at[i, "Amount"] = new_amt
-                        st.session_state["transactions"].at[i, "Description"] = new_desc
-                        st.session_state["editing"] = None
-                        st.success("✅ Transaction updated!")
-                        st.rerun()
-            else:
-                col1, col2 = st.columns(2)
-                with col1:
-                    if st.button(f"✏️ Edit {i}"):
-                        st.session_state["editing"] = i
-                        st.rerun()
-                with col2:
-                    if st.button(f"🗑️ Delete {i}"):
-                        st.session_state["transactions"] = st.session_state["transactions"].drop(i).reset_index(drop=True)
-                        st.success("🗑️ Transaction deleted!")
-                        st.rerun()
+    labels = row_labels(tx_key(), currency, transactions_df())[df.index.to_numpy()].tolist()
+    st.dataframe(df[REQUIRED_COLS], use_container_width=True)
+
+    pos = st.selectbox("Select transaction", options=range(len(labels)), format_func=labels.__getitem__)
+    i = df.index[pos]
+    row = df.loc[i]
+    st.write(f"**Description:** {row['Description']}")
+    if st.session_state["editing"] == i:
+        with st.form("edit_form"):
+            new_type = st.radio("Type", TYPE_OPTIONS, index=0 if row["Type"] == "Income" else 1)
+            new_cat = st.selectbox("Category", CATEGORY_OPTIONS, index=CATEGORY_OPTIONS.index(row["Category"] if row["Category"] in CATEGORY_OPTIONS else "Other"))
+            new_amt = st.number_input("Amount", min_value=0.0, value=float(row["Amount"]) if pd.notna(row["Amount"]) else 0.0, format="%.2f")
+            new_desc = st.text_input("Description", value=row["Description"] if pd.notna(row["Description"]) else "")
+            save = st.form_submit_button("Save")
+            if save:
+                st.session_state["transactions_rows"][i].update(
+                    {"Type": new_type, "Category": new_cat, "Amount": new_amt, "Description": new_desc}
+                )
+                touch_transactions()
+                st.session_state["editing"] = None
+                st.success("✅ Transaction updated!")
+                st.rerun()
+    else:
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button("✏️ Edit"):
+                st.session_state["editing"] = i
+                st.rerun()
+        with col2:
+            if st.button("🗑️ Delete"):
+                st.session_state["transactions_rows"].pop(i)
+                touch_transactions()
+                st.success("🗑️ Transaction deleted!")
+                st.rerun()
 else:
     st.info("No transactions match your filters.")
 
@@ -193,11 +404,11 @@ else:
 # ----------------------------
 st.subheader("📈 Monthly Summary")
 current_month = datetime.now().strftime("%B %Y")
-month_df = st.session_state["transactions"][st.session_state["transactions"]["Date"].dt.strftime("%B %Y") == current_month]
+totals = monthly_totals(tx_key(), transactions_df())
+current_period = pd.Period(datetime.now(), freq="M")
 
-if not month_df.empty:
-    income = month_df[month_df["Type"] == "Income"]["Amount"].sum()
-    expenses = month_df[month_df["Type"] == "Expense"]["Amount"].sum()
+if current_period in totals.index:
+    income, expenses = totals.loc[current_period, TYPE_OPTIONS].astype(float)
     balance = income - expenses
     st.info(f"{current_month} – Income: {currency}{income:,.2f} | Expenses: {currency}{expenses:,.2f} | Balance: {currency}{balance:,.2f}")
 else:
@@ -210,10 +421,12 @@ st.subheader("📉 Visuals")
 colA, colB = st.columns(2)
 
 with colA:
-    exp_df = st.session_state["transactions"]
-    exp_df = exp_df[exp_df["Type"] == "Expense"].copy()
-    if not exp_df.empty:
-        pie_df = exp_df.groupby("Category", as_index=False)["Amount"].sum()
+    tx = transactions_df()
+    pie_df = (
+        tx.loc[(tx["Type"] == "Expense").to_numpy(), ["Category", "Amount"]]
+        .groupby("Category", as_index=False, observed=True, sort=False)["Amount"].sum()
+    )
+    if not pie_df.empty:
         pie = alt.Chart(pie_df).mark_arc().encode(
             theta=alt.Theta(field="Amount", type="quantitative"),
             color=alt.Color(field="Category", type="nominal"),
@@ -222,13 +435,54 @@ with colA:
         st.altair_chart(pie, use_container_width=True)
 
 with colB:
-    df_sorted = st.session_state["transactions"].sort_values("Date").copy()
+    # Rows are appended in time order, so the sort is usually a no-op
+    df_sorted = transactions_df()
+    if not df_sorted["Date"].is_monotonic_increasing:
+        df_sorted = df_sorted.sort_values("Date", kind="mergesort")
     if not df_sorted.empty:
-        df_sorted["Delta"] = df_sorted.apply(lambda r: r["Amount"] if r["Type"] == "Income" else -r["Amount"], axis=1)
-        df_sorted["Balance"] = df_sorted["Delta"].cumsum()
-        line = alt.Chart(df_sorted).mark_line(point=True).encode(
+        is_income = (df_sorted["Type"] == "Income").to_numpy()
+        amount = df_sorted["Amount"].to_numpy(np.float64)
+        # Ship one end-of-day point per day so the chart payload grows with days, not transactions
+        daily = pd.DataFrame({
+            "Date": df_sorted["Date"].dt.floor("D").to_numpy(),
+            "Balance": running_balance(amount, is_income),
+        }).groupby("Date", as_index=False)["Balance"].last()
+        line = alt.Chart(daily).mark_line(point=True).encode(
             x="Date:T",
             y=alt.Y("Balance:Q", title=f"Balance ({currency})"),
             tooltip=["Date", "Balance"]
         )
         st.altair_chart(line, use_container_width=True)
+
+# ----------------------------
+# Import / Export
+# ----------------------------
+st.header("📁 Import / Export")
+col1, col2 = st.columns(2)
+with col1:
+    if "import_result" in st.session_state:
+        n_imported, n_skipped = st.session_state.pop("import_result")
+        st.success(f"✅ Imported {n_imported} transaction(s)!")
+        if n_skipped:
+            st.warning(f"Skipped {n_skipped} row(s) with a missing date, a missing or non-positive amount, or a type other than Income/Expense.")
+    uploaded = st.file_uploader("Import CSV", type="csv")
+    if uploaded is not None and st.button("📥 Import"):
+        try:
+            imported, skipped = read_transactions_csv(uploaded)
+        except (pa.ArrowInvalid, KeyError) as e:
+            st.error(f"Could not import file: {e}")
+        else:
+            new_rows = imported[REQUIRED_COLS].to_dict("records")
+            rows = st.session_state["transactions_rows"]
+            rows.extend(new_rows)
+            rows.sort(key=itemgetter("Date"))  # keep the store in date order
+            touch_transactions(new_rows)
+            st.session_state["import_result"] = (len(imported), skipped)  # shown after the rerun
+            st.rerun()
+with col2:
+    st.download_button(
+        "📤 Export CSV",
+        data=export_csv(tx_key(), transactions_df()),
+        file_name="transactions.csv",
+        mime="text/csv",
+    )